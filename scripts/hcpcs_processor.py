@@ -18,6 +18,7 @@ from utils.common_functions import (
     iso_utc_now,
     save_to_formats,
     basic_cleanup,
+    match_pattern,
     save_invalid_rows,
     resolve_default_hcpcs_url,
 )
@@ -58,7 +59,7 @@ def validate_hcpcs_data(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, s
 
     df = df.copy()
     df[code_col] = df[code_col].astype(str).str.strip().str.upper()
-    valid_mask = df[code_col].str.match(HCPCS_PATTERN, na=False)
+    valid_mask = match_pattern(df[code_col], HCPCS_PATTERN)
 
     valid_rows = df[valid_mask].copy()
     invalid_rows = df[~valid_mask].copy()
@@ -18,6 +18,7 @@ from utils.common_functions import (
     iso_utc_now,
     save_to_formats,
     basic_cleanup,
+    match_pattern,
     save_invalid_rows,
     resolve_default_icd10cm_url,
 )
@@ -59,7 +60,7 @@ def validate_icd10cm_data(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame,
 
     df = df.copy()
     df[code_col] = df[code_col].astype(str).str.strip().str.upper()
-    valid_mask = df[code_col].str.match(ICD10CM_PATTERN, na=False)
+    valid_mask = match_pattern(df[code_col], ICD10CM_PATTERN)
 
     valid_rows = df[valid_mask].copy()
     invalid_rows = df[~valid_mask].copy()
@@ -1,4 +1,4 @@
-import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Tuple
 import sys
@@ -7,12 +7,22 @@ CURRENT_DIR = Path(__file__).resolve().parent
 PROJECT_ROOT = CURRENT_DIR.parent
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
+import numpy as np
 import pandas as pd
 import logging
 
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+    from pandas._libs.parsers import STR_NA_VALUES
+except ImportError:
+    pa = pc = pacsv = None
+
 from utils.common_functions import (
     setup_logging,
     ensure_file,
+    file_sha256,
     iso_utc_now,
     save_to_formats,
     basic_cleanup,
@@ -27,20 +37,209 @@ ERROR_DIR = BASE_DIR / "output" / "errors"
 LOG_DIR = BASE_DIR / "logs"
 
 RAW_FILE = INPUT_DIR / "icd10who_codes_2024.csv"
+CLEAN_BASE = OUTPUT_CSV_DIR / "icd10who_clean"
+CACHE_KEY_FILE = OUTPUT_CSV_DIR / ".icd10who_cache_key"
+
+# Bump when validation/cleanup logic changes so cached outputs are rebuilt
+PIPELINE_VERSION = "v1"
+
+REQUIRED_COLUMNS = ["Code", "Description"]
+
+# ICD-10 grammar: letter, two digits, optionally '.' + 1-4 of [0-9A-Z]
+# (i.e. ^[A-Z][0-9][0-9](\.[0-9A-Z]{1,4})?$). The longest valid code is
+# 8 bytes, so every candidate fits one fixed-width S8 slot / uint64.
+CODE_WIDTH = 8
+
+# Per-byte constants for SWAR (8 lanes per uint64) ASCII case folding
+LANES_LOW7 = np.uint64(0x7F7F7F7F7F7F7F7F)
+LANES_HIGH = np.uint64(0x8080808080808080)
+LANES_FROM_A = np.uint64(0x1F1F1F1F1F1F1F1F)  # 0x80 - ord("a")
+LANES_PAST_Z = np.uint64(0x0505050505050505)  # 0x80 - (ord("z") + 1)
+
+
+def load_icd10_data(filepath: Path) -> pd.DataFrame:
+    """
+    Read only the Code/Description columns, using the multi-threaded PyArrow
+    parser with Arrow-backed strings when available. Only these columns reach
+    the clean output and the invalid-rows file.
+    """
+    read_kwargs = dict(
+        usecols=REQUIRED_COLUMNS,
+        quotechar='"',
+        escapechar='\\',
+    )
+    # The C parser pads short rows with NaN (and, with usecols, ignores extra
+    # fields), while pyarrow can only skip them. Count what pyarrow rejects
+    # and re-read with the C parser if anything would otherwise be lost.
+    rejected_rows = []
+
+    def note_rejected_row(row) -> str:
+        rejected_rows.append(row)
+        return "skip"
+
+    if pa is None:
+        logging.info("pyarrow not installed, falling back to the C CSV parser")
+        return pd.read_csv(filepath, dtype=str, on_bad_lines="skip", **read_kwargs)
+
+    # Read with pyarrow.csv directly so both columns are parsed as strings:
+    # pandas' pyarrow engine infers types first and casts afterwards, which
+    # turns an all-empty column into null and all-numeric codes into int64
+    # ("007" -> 7). Null values mirror pandas' defaults, as the C parser uses.
+    table = pacsv.read_csv(
+        filepath,
+        parse_options=pacsv.ParseOptions(
+            quote_char='"',
+            escape_char='\\',
+            invalid_row_handler=note_rejected_row,
+        ),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=REQUIRED_COLUMNS,
+            column_types={col: pa.string() for col in REQUIRED_COLUMNS},
+            null_values=sorted(STR_NA_VALUES),
+            strings_can_be_null=True,
+        ),
+    )
+    df = table.to_pandas(types_mapper=pd.ArrowDtype)
+
+    if rejected_rows:
+        logging.warning(
+            "%d row(s) in %s have a different field count than the header, re-reading with the C CSV parser",
+            len(rejected_rows),
+            filepath.name,
+        )
+        return pd.read_csv(filepath, dtype=str, on_bad_lines="skip", **read_kwargs)
+    return df
+
+
+def swar_ascii_upper(words: np.ndarray) -> np.ndarray:
+    """
+    Uppercase ASCII a-z in every byte of a uint64 array, 8 bytes per word.
+
+    Each lane's high bit flags "byte >= 'a'" and "byte > 'z'"; lanes that are
+    lowercase (and not part of a multi-byte UTF-8 sequence) get 0x20 cleared.
+    The low-7-bit mask keeps the additions from carrying into the next lane.
+    """
+    low7 = words & LANES_LOW7
+    is_lower = (low7 + LANES_FROM_A) & ~(low7 + LANES_PAST_Z) & ~words & LANES_HIGH
+    return words ^ (is_lower >> np.uint64(2))
+
+
+def ascii_upper_arrow(arr: "pa.Array") -> "pa.Array":
+    """
+    Apply swar_ascii_upper to the data buffer of an Arrow string array.
+    Offsets and validity buffers are reused as-is.
+    """
+    if isinstance(arr, pa.ChunkedArray):
+        arr = arr.combine_chunks()
+    validity, offsets, data = arr.buffers()
+    if data is None or data.size == 0:
+        return arr
+
+    raw = np.frombuffer(data, dtype=np.uint8)
+    padded = np.zeros(-(-raw.size // 8) * 8, dtype=np.uint8)
+    padded[: raw.size] = raw
+    upper = swar_ascii_upper(padded.view(np.uint64)).view(np.uint8)
+    return pa.Array.from_buffers(
+        arr.type,
+        len(arr),
+        [validity, offsets, pa.py_buffer(upper)],
+        null_count=arr.null_count,
+        offset=arr.offset,
+    )
+
+
+def fixed_width_codes(arr: "pa.Array") -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Gather an Arrow string array into fixed-width S8 codes straight from its
+    offsets/data buffers. Returns the codes and their byte lengths; rows that
+    don't fit (null or longer than CODE_WIDTH) are zero-filled with length -1.
+    """
+    if isinstance(arr, pa.ChunkedArray):
+        arr = arr.combine_chunks()
+    fixed = np.zeros((len(arr), CODE_WIDTH), dtype=np.uint8)
+    _, offsets, data = arr.buffers()
+    offset_type = np.int64 if pa.types.is_large_string(arr.type) else np.int32
+    offs = np.frombuffer(offsets, dtype=offset_type)[arr.offset : arr.offset + len(arr) + 1]
+    lengths = np.diff(offs)
+    fits = (lengths <= CODE_WIDTH) & arr.is_valid().to_numpy(zero_copy_only=False)
+
+    if data is not None and data.size:
+        raw = np.frombuffer(data, dtype=np.uint8)
+        lanes = np.arange(CODE_WIDTH)
+        in_code = (lanes < lengths[:, None]) & fits[:, None]
+        gathered = raw[np.minimum(offs[:-1, None].astype(np.int64) + lanes, raw.size - 1)]
+        np.copyto(fixed, gathered, where=in_code)
+    return fixed.view(f"S{CODE_WIDTH}").ravel(), np.where(fits, lengths, -1)
+
+
+def match_fixed_codes(fixed: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """
+    Check the ICD-10 grammar on S8 codes with a handful of byte comparisons
+    over the whole (n, 8) byte matrix, instead of running a regex per code.
+    """
+    code_bytes = fixed.view(np.uint8).reshape(-1, CODE_WIDTH)
+    is_digit = (code_bytes >= ord("0")) & (code_bytes <= ord("9"))
+    is_letter = (code_bytes >= ord("A")) & (code_bytes <= ord("Z"))
+
+    head_ok = is_letter[:, 0] & is_digit[:, 1] & is_digit[:, 2]
+    # Either exactly 3 bytes, or a '.' at byte 3 followed by 1-4 more
+    shape_ok = (lengths == 3) | ((lengths >= 5) & (code_bytes[:, 3] == ord(".")))
+    in_suffix = (np.arange(CODE_WIDTH) >= 4) & (np.arange(CODE_WIDTH) < lengths[:, None])
+    suffix_ok = (is_digit | is_letter | ~in_suffix).all(axis=1)
+    return head_ok & shape_ok & suffix_ok
+
+
+def scan_icd10_codes(codes: pd.Series) -> Tuple[pd.Series, np.ndarray, np.ndarray]:
+    """
+    Canonicalize (strip + upper) and validate the Code column in one sweep.
+    Returns the canonical codes plus the valid and invalid row positions.
+
+    With pyarrow the column is materialized once as an Arrow array and every
+    step runs as an Arrow compute kernel on it; only the final canonical array
+    is wrapped back into a Series. Validation then works on a fixed-width S8
+    copy of the codes.
+    """
+    if not pd.api.types.is_string_dtype(codes):
+        codes = codes.astype(str)
+
+    if pa is None:
+        canonical = codes.str.strip().str.upper()
+        encoded = canonical.str.encode("utf-8")
+        lengths = encoded.str.len().to_numpy(dtype=float, na_value=np.nan)
+        fits = lengths <= CODE_WIDTH
+        fixed = encoded.where(fits, b"").to_numpy(dtype=f"S{CODE_WIDTH}")
+        lengths = np.where(fits, lengths, -1).astype(np.int64)
+    else:
+        arr = ascii_upper_arrow(pc.utf8_trim_whitespace(pa.array(codes)))
+        canonical = pd.Series(pd.arrays.ArrowExtensionArray(arr), index=codes.index, name=codes.name)
+        fixed, lengths = fixed_width_codes(arr)
+
+    valid = match_fixed_codes(fixed, lengths)
+    return canonical, np.flatnonzero(valid), np.flatnonzero(~valid)
+
+
+def first_occurrences(codes: pd.Series) -> np.ndarray:
+    """
+    Positions of the first occurrence of each code. Expects non-null,
+    already validated codes, so each zero-padded S8 code is a single uint64
+    key and one np.unique over the keys replaces drop_duplicates.
+    """
+    if pa is None:
+        fixed = codes.str.encode("utf-8").to_numpy(dtype=f"S{CODE_WIDTH}")
+    else:
+        fixed, _ = fixed_width_codes(pa.array(codes))
+    return np.sort(np.unique(fixed.view(np.uint64), return_index=True)[1])
 
-ICD10_PATTERN = re.compile(r"^[A-Z][0-9][0-9](\.[0-9A-Z]{1,4})?$")
 
 def validate_icd10_data(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
-    required_columns = ["Code", "Description"]
-    for col in required_columns:
+    for col in REQUIRED_COLUMNS:
         if col not in df.columns:
             raise ValueError(f"Missing required column: {col}")
 
-    df["Code"] = df["Code"].astype(str).str.strip().str.upper()
-    valid_mask = df["Code"].str.match(ICD10_PATTERN, na=False)
+    df["Code"], valid_idx, invalid_idx = scan_icd10_codes(df["Code"])
 
-    valid_rows = df[valid_mask].copy()
-    invalid_rows = df[~valid_mask].copy()
+    valid_rows = df.take(valid_idx)
+    invalid_rows = df.take(invalid_idx)
 
     return valid_rows, invalid_rows
 
@@ -54,10 +253,38 @@ def clean_icd10_data(df: pd.DataFrame) -> pd.DataFrame:
     )
     df = basic_cleanup(df)
     df = df.dropna(subset=["code", "description"])
-    df = df.drop_duplicates(subset=["code"])
-    df["last_updated"] = iso_utc_now()
+    # De-duplicate only after dropna, so a first occurrence without a
+    # description doesn't shadow a later complete row for the same code
+    df = df.take(first_occurrences(df["code"]))
+    # One shared timestamp: a single-category column stores 1 byte per row
+    # instead of N references to identical strings
+    df["last_updated"] = pd.Categorical.from_codes(
+        np.zeros(len(df), dtype=np.int8), categories=[iso_utc_now()]
+    )
     return df
 
+
+def input_cache_key(raw_path: Path) -> str:
+    """
+    Fingerprint of the raw input: content SHA-256 + pipeline version.
+    ensure_file rewrites the file on every successful download, so size and
+    mtime change even when the bytes don't; hashing is still far cheaper
+    than parsing and validating.
+    """
+    return f"{file_sha256(raw_path)}-{PIPELINE_VERSION}"
+
+
+def outputs_up_to_date(cache_key: str) -> bool:
+    """
+    True when the clean CSV exists and was built from an input with this key.
+    """
+    return (
+        CLEAN_BASE.with_suffix(".csv").exists()
+        and CACHE_KEY_FILE.exists()
+        and CACHE_KEY_FILE.read_text().strip() == cache_key
+    )
+
+
 def main():
     setup_logging(LOG_DIR / "icd10who.log")
     logging.info("=" * 60)
@@ -70,12 +297,31 @@ def main():
         retries=3,
         url_override=resolve_default_icd10who_url(),
     )
-    raw_df = pd.read_csv(raw_path, dtype=str, on_bad_lines="skip", quotechar='"', escapechar='\\')
+    cache_key = input_cache_key(raw_path)
+    if outputs_up_to_date(cache_key):
+        for output in (CLEAN_BASE.with_suffix(".csv"), CLEAN_BASE.with_suffix(".parquet")):
+            if output.exists():
+                output.touch()
+        logging.info("Input unchanged since last run (%s), skipping processing", cache_key)
+        print("✅ ICD-10 WHO outputs already up to date")
+        return
+
+    # Drop the old key before touching the outputs, so a run that fails midway
+    # can never leave them cached under a previous input's key
+    CACHE_KEY_FILE.unlink(missing_ok=True)
+    raw_df = load_icd10_data(raw_path)
     valid_df, invalid_df = validate_icd10_data(raw_df)
-    if not invalid_df.empty:
-        save_invalid_rows(invalid_df, ERROR_DIR / "icd10who_invalid")
-    clean_df = clean_icd10_data(valid_df)
-    save_to_formats(clean_df, OUTPUT_CSV_DIR / "icd10who_clean")
+    # The error file is independent of the clean stage, so write it in the
+    # background; .result() re-raises any write error before the run is cached
+    with ThreadPoolExecutor(max_workers=1) as writer:
+        invalid_write = None
+        if not invalid_df.empty:
+            invalid_write = writer.submit(save_invalid_rows, invalid_df, ERROR_DIR / "icd10who_invalid")
+        clean_df = clean_icd10_data(valid_df)
+        save_to_formats(clean_df, CLEAN_BASE)
+        if invalid_write is not None:
+            invalid_write.result()
+    CACHE_KEY_FILE.write_text(cache_key)
     print("✅ ICD-10 WHO processing completed")
 
 
@@ -18,6 +18,7 @@ from utils.common_functions import (
     iso_utc_now,
     save_to_formats,
     basic_cleanup,
+    match_pattern,
     save_invalid_rows,
     resolve_default_loinc_url,
 )
@@ -57,7 +58,7 @@ def validate_loinc_data(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, s
 
     df = df.copy()
     df[code_col] = df[code_col].astype(str).str.strip().str.upper()
-    valid_mask = df[code_col].str.match(LOINC_PATTERN, na=False)
+    valid_mask = match_pattern(df[code_col], LOINC_PATTERN)
 
     valid_rows = df[valid_mask].copy()
     invalid_rows = df[~valid_mask].copy()
@@ -9,6 +9,7 @@ PROJECT_ROOT = CURRENT_DIR.parent
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
+import numpy as np
 import pandas as pd
 import logging
 
@@ -20,6 +21,7 @@ from utils.common_functions import (
     basic_cleanup,
     save_invalid_rows,
     resolve_latest_npi_monthly_zip,
+    match_pattern,
 )
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -107,9 +109,10 @@ def validate_npi_data(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, str
 
     df = df.copy()
     df[npi_col] = df[npi_col].astype(str).fillna("").str.replace(r"\D", "", regex=True)
-    ten_digit_mask = df[npi_col].str.fullmatch(r"\d{10}", na=False)
-    luhn_mask = df[npi_col].apply(is_valid_npi)
-    valid_mask = ten_digit_mask & luhn_mask
+    ten_digit_mask = match_pattern(df[npi_col], NPI_10_DIGITS)
+    # Only 10-digit candidates need the per-row Luhn check
+    valid_mask = ten_digit_mask.copy()
+    valid_mask[ten_digit_mask] = df.loc[ten_digit_mask, npi_col].map(is_valid_npi).to_numpy(dtype=bool)
     valid_rows = df[valid_mask].copy()
     invalid_rows = df[~valid_mask].copy()
     return valid_rows, invalid_rows, npi_col
@@ -0,0 +1,75 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional
+import sys
+
+# Ensure project root is on sys.path when running this file directly
+CURRENT_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = CURRENT_DIR.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import logging
+
+from scripts import (
+    hcpcs_processor,
+    icd10cm_processor,
+    icd10who_processor,
+    loinc_processor,
+    npi_processor,
+    rxnorm_processor,
+    snomed_processor,
+)
+from utils.common_functions import setup_logging
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+LOG_DIR = BASE_DIR / "logs"
+
+PIPELINES = {
+    "icd10who": icd10who_processor.main,
+    "icd10cm": icd10cm_processor.main,
+    "hcpcs": hcpcs_processor.main,
+    "npi": npi_processor.main,
+    "loinc": loinc_processor.main,
+    "rxnorm": rxnorm_processor.main,
+    "snomed": snomed_processor.main,
+}
+
+
+def run_pipeline(name: str, pipeline: Callable[[], None]) -> bool:
+    """
+    Run one codex pipeline, logging (not raising) failures so the others keep going.
+    """
+    logging.info("Starting %s pipeline", name)
+    try:
+        pipeline()
+    except Exception:
+        logging.exception("%s pipeline failed", name)
+        return False
+    logging.info("Finished %s pipeline", name)
+    return True
+
+
+def main(names: Optional[List[str]] = None):
+    """
+    Run the selected codex pipelines (all by default) concurrently. Downloads,
+    CSV parsing and Arrow kernels release the GIL, so threads overlap well.
+    """
+    setup_logging(LOG_DIR / "run_all.log")
+    names = names or list(PIPELINES)
+    unknown = [n for n in names if n not in PIPELINES]
+    if unknown:
+        raise ValueError(f"Unknown pipeline(s): {', '.join(unknown)}. Choose from: {', '.join(PIPELINES)}")
+
+    with ThreadPoolExecutor(max_workers=len(names)) as executor:
+        results = list(executor.map(lambda n: run_pipeline(n, PIPELINES[n]), names))
+
+    failed = [n for n, ok in zip(names, results) if not ok]
+    if failed:
+        print(f"❌ Failed pipelines: {', '.join(failed)}")
+        sys.exit(1)
+    print(f"✅ All pipelines completed: {', '.join(names)}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
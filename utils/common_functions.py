@@ -2,13 +2,31 @@ from pathlib import Path
 import os
 import logging
 from logging.handlers import RotatingFileHandler
+import numpy as np
 import pandas as pd
 import requests
 import re
+import hashlib
+import shutil
+import tempfile
 import zipfile
-from io import BytesIO
 from datetime import datetime
-from typing import Optional
+from typing import BinaryIO, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = pc = pacsv = None
+
+DOWNLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
+
+
+class ChecksumMismatchError(ValueError):
+    """
+    Download does not match the SHA-256 pinned in <NAME>_SHA256.
+    """
 
 
 def basic_cleanup(df: pd.DataFrame) -> pd.DataFrame:
@@ -20,21 +38,95 @@ def basic_cleanup(df: pd.DataFrame) -> pd.DataFrame:
         df["code"] = df["code"].astype(str).str.strip().str.upper()
 
     if "description" in df.columns:
-        df["description"] = df["description"].astype(str).str.strip().str.title()
+        description = df["description"]
+        if (
+            pa is not None
+            and isinstance(description.dtype, pd.ArrowDtype)
+            and (
+                pa.types.is_string(description.dtype.pyarrow_dtype)
+                or pa.types.is_large_string(description.dtype.pyarrow_dtype)
+            )
+        ):
+            # Already Arrow strings (e.g. ICD-10 WHO's pyarrow loader): trim +
+            # title-case as two Arrow kernels over the string buffer. Nulls stay
+            # null here, as they do for pandas' own string dtypes. Other Arrow
+            # types (null, int64, ...) have no utf8 kernels and go via astype(str).
+            titled = pc.utf8_title(pc.utf8_trim_whitespace(pa.array(description)))
+            df["description"] = pd.Series(pd.arrays.ArrowExtensionArray(titled), index=df.index)
+        else:
+            df["description"] = description.astype(str).str.strip().str.title()
 
     return df
 
 
+def match_pattern(values: pd.Series, pattern: re.Pattern) -> np.ndarray:
+    """
+    Boolean mask of values matching pattern at the start of the string, like
+    values.str.match(pattern, na=False), with missing values as False.
+
+    With pyarrow the whole column is scanned in one call by Arrow's RE2
+    (automaton-based) regex kernel instead of invoking re.match per row.
+    RE2 is not Python's re: "$" does not match before a trailing newline and
+    digit/word classes are ASCII-only, so pass stripped ASCII codes. Patterns
+    with flags are rejected since they are not carried over to RE2.
+    """
+    if pattern.flags & ~re.UNICODE:
+        raise ValueError(f"match_pattern does not support regex flags: {pattern!r}")
+    if pa is None or not pd.api.types.is_string_dtype(values):
+        return values.str.match(pattern, na=False).to_numpy(dtype=bool)
+    # match_substring_regex searches anywhere; anchor it like re.match
+    anchored = f"^(?:{pattern.pattern})"
+    matched = pc.match_substring_regex(pa.array(values), anchored)
+    return pc.fill_null(matched, False).to_numpy(zero_copy_only=False)
+
+
+def write_csv(df: pd.DataFrame, output_csv: Path):
+    """
+    Write DataFrame as CSV with PyArrow's native writer, falling back to
+    DataFrame.to_csv when pyarrow is missing or cannot convert a column.
+    """
+    if pa is not None:
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed-type object columns have no single Arrow type
+            table = None
+        if table is not None:
+            pacsv.write_csv(
+                table,
+                str(output_csv),
+                write_options=pacsv.WriteOptions(include_header=True),
+            )
+            return
+
+    df.to_csv(output_csv, index=False)
+
+
 def save_to_formats(df: pd.DataFrame, base_path: Path):
     """
-    Save DataFrame to standardized CSV format.
+    Save DataFrame to standardized CSV format, plus a zstd-compressed
+    Parquet copy for fast downstream re-reads when pyarrow is available.
     """
     base_path.parent.mkdir(parents=True, exist_ok=True)
 
     output_csv = base_path.with_suffix(".csv")
-    df.to_csv(output_csv, index=False)
+    write_csv(df, output_csv)
     print(f"✅ Clean file saved: {output_csv}")
 
+    if pa is None:
+        logging.info("pyarrow not installed, skipping Parquet output")
+        return
+
+    output_parquet = base_path.with_suffix(".parquet")
+    try:
+        df.to_parquet(output_parquet, engine="pyarrow", compression="zstd", index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        logging.warning("Could not write Parquet output %s: %s", output_parquet, e)
+        # Don't leave a previous run's Parquet disagreeing with the new CSV
+        output_parquet.unlink(missing_ok=True)
+        return
+    print(f"✅ Clean file saved: {output_parquet}")
+
 
 def save_invalid_rows(df: pd.DataFrame, base_path: Path):
     """
@@ -47,7 +139,7 @@ def save_invalid_rows(df: pd.DataFrame, base_path: Path):
     base_path.parent.mkdir(parents=True, exist_ok=True)
 
     output_csv = base_path.with_suffix(".csv")
-    df.to_csv(output_csv, index=False)
+    write_csv(df, output_csv)
 
     print(f"⚠️ Invalid rows saved: {output_csv}")
 
@@ -74,6 +166,47 @@ def setup_logging(log_file: Path):
     logger.addHandler(fh)
 
 
+def stream_response(resp: requests.Response, dst: BinaryIO) -> Tuple[int, str]:
+    """
+    Copy a streamed response body into an open binary file in fixed-size
+    chunks, hashing it on the way, so memory stays bounded regardless of
+    download size. Returns the number of bytes written and the SHA-256 hex digest.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in resp.iter_content(DOWNLOAD_CHUNK_SIZE):
+        digest.update(chunk)
+        dst.write(chunk)
+        size += len(chunk)
+    return size, digest.hexdigest()
+
+
+def file_sha256(path: Path) -> str:
+    """
+    SHA-256 hex digest of a file, read in DOWNLOAD_CHUNK_SIZE chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def verify_sha256(digest: str, checksum_env_var: str):
+    """
+    Compare a download digest against the expected value from checksum_env_var,
+    raising ChecksumMismatchError if they differ. Only logs the digest when the
+    variable is unset.
+    """
+    expected = os.getenv(checksum_env_var, "").strip().lower()
+    if not expected:
+        logging.info("   SHA-256: %s (set %s to verify)", digest, checksum_env_var)
+        return
+    if digest != expected:
+        raise ChecksumMismatchError(f"SHA-256 mismatch: expected {expected}, got {digest}")
+    logging.info("   SHA-256 verified: %s", digest)
+
+
 def ensure_file(
     raw_path: Path,
     url_env_var: str,
@@ -85,18 +218,21 @@ def ensure_file(
 ) -> Path:
     """
     Ensure file exists at raw_path. Tries online download first, falls back to local file if download fails.
+    Downloads are checked against the SHA-256 in <NAME>_SHA256 (e.g. ICD10WHO_SHA256 for ICD10WHO_URL) when set;
+    a mismatch raises ChecksumMismatchError without retrying or falling back.
     """
     # Ensure we're working with absolute path
     raw_path = Path(raw_path).resolve()
     
     # Determine URL source
     env_url = os.getenv(url_env_var, "")
+    checksum_env_var = re.sub(r"_URL$", "", url_env_var) + "_SHA256"
     url = env_url or (url_override or "")
     
     # Log source type and path info
-    logging.info(f"🔍 Checking file: {raw_path}")
-    logging.info(f"   Absolute path: {raw_path}")
-    logging.info(f"   File exists: {raw_path.exists()}")
+    logging.info("🔍 Checking file: %s", raw_path)
+    logging.info("   Absolute path: %s", raw_path)
+    logging.info("   File exists: %s", raw_path.exists())
     
     if url_override and not env_url:
         source_type = "HARDCODED URL"
@@ -111,91 +247,123 @@ def ensure_file(
     
     # Try online download first if URL is available
     if url:
-        logging.info(f"🌐 Attempting online download first: {raw_path}")
-        logging.info(f"   Source: {source_type}")
-        logging.info(f"   URL: {url}")
+        logging.info("🌐 Attempting online download first: %s", raw_path)
+        logging.info("   Source: %s", source_type)
+        logging.info("   URL: %s", url)
         
         raw_path.parent.mkdir(parents=True, exist_ok=True)
         for attempt in range(1, retries + 1):
             try:
-                logging.info(f"   Download attempt {attempt}/{retries}...")
-                resp = requests.get(url, timeout=timeout)
-                resp.raise_for_status()
-                if not resp.content:
-                    raise ValueError("Downloaded file is empty")
-
-                content_type = resp.headers.get("Content-Type", "").lower()
-                url_lower = url.lower()
-                is_zip = url_lower.endswith(".zip") or "zip" in content_type
-
-                if is_zip:
-                    with zipfile.ZipFile(BytesIO(resp.content)) as zf:
-                        members = [zi for zi in zf.infolist() if not zi.is_dir()]
-                        if not members:
-                            raise ValueError("Zip file contains no files")
-
-                        def is_textual(name: str) -> bool:
-                            return name.lower().endswith((".csv", ".txt", ".tsv"))
-
-                        candidates = [zi for zi in members if is_textual(zi.filename)]
-
-                        if prefer_regex:
-                            pref_re = re.compile(prefer_regex)
-                            preferred = [zi for zi in candidates if pref_re.search(zi.filename)]
-                            if preferred:
-                                candidates = preferred
-
-                        if exclude_regex:
-                            excl_re = re.compile(exclude_regex)
-                            candidates = [zi for zi in candidates if not excl_re.search(zi.filename)]
-
-                        if not candidates:
-                            # Fallback to any file if no textual candidates survived
-                            candidates = members
-
-                        # Choose the largest remaining candidate (heuristic for main dataset)
-                        chosen = max(candidates, key=lambda zi: zi.file_size)
-
-                        suffix = Path(chosen.filename).suffix or raw_path.suffix
-                        target_path = raw_path.with_suffix(suffix)
-                        with zf.open(chosen) as src, open(target_path, "wb") as dst:
-                            dst.write(src.read())
-                        logging.info(f"✅ ONLINE DOWNLOAD SUCCESSFUL")
-                        logging.info(f"   Extracted {chosen.filename} ({chosen.file_size:,} bytes) to {target_path}")
+                logging.info("   Download attempt %d/%d...", attempt, retries)
+                with requests.get(url, timeout=timeout, stream=True) as resp:
+                    resp.raise_for_status()
+
+                    content_type = resp.headers.get("Content-Type", "").lower()
+                    url_lower = url.lower()
+                    is_zip = url_lower.endswith(".zip") or "zip" in content_type
+
+                    if is_zip:
+                        # ZipFile needs a seekable source, so spool the archive to disk
+                        with tempfile.TemporaryFile() as spool:
+                            file_size, digest = stream_response(resp, spool)
+                            if not file_size:
+                                raise ValueError("Downloaded file is empty")
+                            verify_sha256(digest, checksum_env_var)
+                            spool.seek(0)
+                            with zipfile.ZipFile(spool) as zf:
+                                members = [zi for zi in zf.infolist() if not zi.is_dir()]
+                                if not members:
+                                    raise ValueError("Zip file contains no files")
+
+                                def is_textual(name: str) -> bool:
+                                    return name.lower().endswith((".csv", ".txt", ".tsv"))
+
+                                candidates = [zi for zi in members if is_textual(zi.filename)]
+
+                                if prefer_regex:
+                                    pref_re = re.compile(prefer_regex)
+                                    preferred = [zi for zi in candidates if pref_re.search(zi.filename)]
+                                    if preferred:
+                                        candidates = preferred
+
+                                if exclude_regex:
+                                    excl_re = re.compile(exclude_regex)
+                                    candidates = [zi for zi in candidates if not excl_re.search(zi.filename)]
+
+                                if not candidates:
+                                    # Fallback to any file if no textual candidates survived
+                                    candidates = members
+
+                                # Choose the largest remaining candidate (heuristic for main dataset)
+                                chosen = max(candidates, key=lambda zi: zi.file_size)
+
+                                suffix = Path(chosen.filename).suffix or raw_path.suffix
+                                target_path = raw_path.with_suffix(suffix)
+                                # Extract into a .part file too, so a corrupt member
+                                # never clobbers the local fallback copy
+                                part_path = target_path.with_name(target_path.name + ".part")
+                                try:
+                                    with zf.open(chosen) as src, open(part_path, "wb") as dst:
+                                        shutil.copyfileobj(src, dst, DOWNLOAD_CHUNK_SIZE)
+                                    part_path.replace(target_path)
+                                finally:
+                                    part_path.unlink(missing_ok=True)
+                        logging.info("✅ ONLINE DOWNLOAD SUCCESSFUL")
+                        logging.info(
+                            "   Extracted %s (%s bytes) to %s",
+                            chosen.filename,
+                            format(chosen.file_size, ","),
+                            target_path,
+                        )
+                        return target_path
+                    else:
+                        # Direct file download
+                        target_path = raw_path
+                        # If server suggests a filename with different suffix, honor it for better downstream handling
+                        cd = resp.headers.get("Content-Disposition", "")
+                        m = re.search(r'filename\*?=(?:UTF-8\'\')?"?([^";]+)"?', cd)
+                        if m:
+                            suggested = Path(m.group(1)).suffix
+                            if suggested and suggested != target_path.suffix:
+                                target_path = raw_path.with_suffix(suggested)
+                        # Stream into a sibling .part file so a failed transfer never
+                        # clobbers the local copy used as fallback
+                        part_path = target_path.with_name(target_path.name + ".part")
+                        try:
+                            with open(part_path, "wb") as dst:
+                                file_size, digest = stream_response(resp, dst)
+                            if not file_size:
+                                raise ValueError("Downloaded file is empty")
+                            verify_sha256(digest, checksum_env_var)
+                            part_path.replace(target_path)
+                        finally:
+                            part_path.unlink(missing_ok=True)
+                        logging.info("✅ ONLINE DOWNLOAD SUCCESSFUL")
+                        logging.info("   Downloaded %s bytes to %s", format(file_size, ","), target_path)
                         return target_path
-                else:
-                    # Direct file download
-                    target_path = raw_path
-                    # If server suggests a filename with different suffix, honor it for better downstream handling
-                    cd = resp.headers.get("Content-Disposition", "")
-                    m = re.search(r'filename\*?=(?:UTF-8\'\')?"?([^";]+)"?', cd)
-                    if m:
-                        suggested = Path(m.group(1)).suffix
-                        if suggested and suggested != target_path.suffix:
-                            target_path = raw_path.with_suffix(suggested)
-                    file_size = len(resp.content)
-                    target_path.write_bytes(resp.content)
-                    logging.info(f"✅ ONLINE DOWNLOAD SUCCESSFUL")
-                    logging.info(f"   Downloaded {file_size:,} bytes to {target_path}")
-                    return target_path
+            except ChecksumMismatchError as e:
+                # The same bytes will fail again, and the local copy may be the
+                # stale file the pin was meant to replace: fail instead of retrying
+                logging.error("❌ ONLINE DOWNLOAD REJECTED - %s", e)
+                raise
             except Exception as e:
                 last_error = e
-                logging.warning(f"   Download attempt {attempt} failed: {e}")
+                logging.warning("   Download attempt %d failed: %s", attempt, e)
         
         logging.warning("❌ ONLINE DOWNLOAD FAILED - All download attempts exhausted")
-        logging.warning(f"   Last error: {last_error}")
+        logging.warning("   Last error: %s", last_error)
         logging.info("   Falling back to local file check...")
     else:
         # No URL available, check local file first
         if url_override is None:
-            logging.info(f"📁 URL resolution failed (could not find valid URL), checking for local file: {raw_path}")
+            logging.info("📁 URL resolution failed (could not find valid URL), checking for local file: %s", raw_path)
         else:
-            logging.info(f"📁 No URL available (no {url_env_var} env var), checking for local file: {raw_path}")
+            logging.info("📁 No URL available (no %s env var), checking for local file: %s", url_env_var, raw_path)
     
     # Fallback to local file (always check, whether download failed or no URL was available)
-    logging.info(f"🔍 Final check - File exists: {raw_path.exists()}")
+    logging.info("🔍 Final check - File exists: %s", raw_path.exists())
     if raw_path.exists():
-        logging.info(f"📁 Using local file: {raw_path}")
+        logging.info("📁 Using local file: %s", raw_path)
         logging.info("   Source: LOCAL FILE (online download failed or unavailable)")
         return raw_path
     